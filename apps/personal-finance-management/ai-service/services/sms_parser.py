@@ -4,8 +4,10 @@ Parses SMS messages from various Pakistani banks to extract transaction data
 """
 
 import asyncio
+import functools
 import logging
 import re
+from dataclasses import dataclass
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import json
@@ -16,10 +18,70 @@ from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+_INSERT_TRANSACTION_SQL = """
+    INSERT INTO transactions (
+        user_id, amount, description, merchant_name,
+        transaction_date, sms_source, sms_raw_text, sms_parsed_data
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+"""
+
+@dataclass(slots=True)
+class Template:
+    """Compiled SMS template for a single bank"""
+    pattern: re.Pattern
+    amount_idx: int
+    merchant_idx: int
+    balance_idx: int
+    date_idx: int
+    txn_type: str
+
+# Default templates for Pakistani banks, compiled at module import so a
+# fresh worker pays the regex compilation cost at warm-up rather than on
+# the first parse_sms request
+_DEFAULT_TEMPLATE_REGEXES = {
+    'HBL': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*debited.*at\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
+    'UBL': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*debited.*at\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
+    'MCB': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*debited.*at\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
+    'Bank Alfalah': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*debited.*at\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
+    'JazzCash': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*paid.*to\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
+    'EasyPaisa': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*paid.*to\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
+    'Raast': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*transferred.*to\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*'
+}
+
+_DEFAULT_TEMPLATES = {
+    bank_name: Template(
+        pattern=re.compile(regex, re.IGNORECASE | re.DOTALL),
+        amount_idx=1,
+        merchant_idx=2,
+        balance_idx=4,
+        date_idx=3,
+        txn_type='expense'
+    )
+    for bank_name, regex in _DEFAULT_TEMPLATE_REGEXES.items()
+}
+
+# Hot-path regexes, also compiled at import
+_DATE_FALLBACK_RE = re.compile(r'(\d{1,2})[-/](\d{1,2})[-/](\d{2,4})')
+_DATE_DMY_RE = re.compile(r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{2,4})')
+_AMOUNT_FORMAT_RE = re.compile(r'Rs\.?\s*\d+')
+
+# Precomputed value -> member mapping, avoiding the enum constructor's
+# member scan on every parsed SMS
+_TXN_TYPE = {t.value: t for t in TransactionType}
+
+# Keywords used for confidence scoring
+_BANK_KEYWORDS = ('hbl', 'ubl', 'mcb', 'alfalah', 'jazz', 'easypaisa', 'raast')
+_TRANSACTION_KEYWORDS = ('debited', 'paid', 'transferred', 'withdrawn', 'spent')
+
 class SMSParser:
     def __init__(self):
-        self.templates = {}
+        self.templates: Dict[str, Template] = dict(_DEFAULT_TEMPLATES)
         self.is_initialized = False
+        self._db = None
+        self._insert_stmt = None
+        # Banks frequently re-send identical SMS (retries, device sync);
+        # memoize parse results by content so duplicates skip the regex work
+        self._parse_cached = functools.lru_cache(maxsize=8192)(self._parse_with_template_uncached)
         
     async def initialize(self):
         """Initialize SMS parser with bank templates"""
@@ -28,7 +90,11 @@ class SMSParser:
             
             # Load SMS templates from database
             await self._load_sms_templates()
-            
+
+            # Reuse one connection and prepare the insert once so Postgres
+            # skips parsing/planning the statement on every stored SMS
+            await self._prepare_insert()
+
             self.is_initialized = True
             logger.info("SMS parser initialized successfully")
             
@@ -49,14 +115,14 @@ class SMSParser:
             result = await db.fetch_all(query)
             
             for row in result:
-                self.templates[row['bank_name']] = {
-                    'regex': row['template_regex'],
-                    'amount_group': row['amount_group'],
-                    'merchant_group': row['merchant_group'],
-                    'balance_group': row['balance_group'],
-                    'date_group': row['date_group'],
-                    'transaction_type': row['transaction_type']
-                }
+                self.templates[row['bank_name']] = Template(
+                    pattern=re.compile(row['template_regex'], re.IGNORECASE | re.DOTALL),
+                    amount_idx=row['amount_group'],
+                    merchant_idx=row['merchant_group'],
+                    balance_idx=row['balance_group'],
+                    date_idx=row['date_group'],
+                    txn_type=row['transaction_type']
+                )
             
             logger.info(f"Loaded {len(self.templates)} SMS templates")
             
@@ -67,64 +133,7 @@ class SMSParser:
     
     def _load_default_templates(self):
         """Load default SMS templates for Pakistani banks"""
-        self.templates = {
-            'HBL': {
-                'regex': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*debited.*at\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
-                'amount_group': 1,
-                'merchant_group': 2,
-                'balance_group': 4,
-                'date_group': 3,
-                'transaction_type': 'expense'
-            },
-            'UBL': {
-                'regex': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*debited.*at\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
-                'amount_group': 1,
-                'merchant_group': 2,
-                'balance_group': 4,
-                'date_group': 3,
-                'transaction_type': 'expense'
-            },
-            'MCB': {
-                'regex': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*debited.*at\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
-                'amount_group': 1,
-                'merchant_group': 2,
-                'balance_group': 4,
-                'date_group': 3,
-                'transaction_type': 'expense'
-            },
-            'Bank Alfalah': {
-                'regex': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*debited.*at\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
-                'amount_group': 1,
-                'merchant_group': 2,
-                'balance_group': 4,
-                'date_group': 3,
-                'transaction_type': 'expense'
-            },
-            'JazzCash': {
-                'regex': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*paid.*to\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
-                'amount_group': 1,
-                'merchant_group': 2,
-                'balance_group': 4,
-                'date_group': 3,
-                'transaction_type': 'expense'
-            },
-            'EasyPaisa': {
-                'regex': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*paid.*to\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
-                'amount_group': 1,
-                'merchant_group': 2,
-                'balance_group': 4,
-                'date_group': 3,
-                'transaction_type': 'expense'
-            },
-            'Raast': {
-                'regex': r'.*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?)\s*transferred.*to\s+(.+?)\s*on\s+(\d{2}-?\d{2}-?\d{4}).*Bal\s*Rs\.?\s*(\d+(?:,\d{3})*(?:\.\d{2})?).*',
-                'amount_group': 1,
-                'merchant_group': 2,
-                'balance_group': 4,
-                'date_group': 3,
-                'transaction_type': 'expense'
-            }
-        }
+        self.templates = dict(_DEFAULT_TEMPLATES)
     
     async def parse_sms(
         self,
@@ -159,7 +168,7 @@ class SMSParser:
                     merchant_name=result['merchant_name'],
                     transaction_date=result['transaction_date'],
                     balance=result['balance'],
-                    transaction_type=TransactionType(result['transaction_type']),
+                    transaction_type=_TXN_TYPE[result['transaction_type']],
                     confidence_score=result['confidence_score'],
                     raw_data=result['raw_data']
                 )
@@ -201,48 +210,87 @@ class SMSParser:
         return name_mapping.get(bank_name, bank_name)
     
     def _parse_with_template(self, sms_text: str, bank_name: str) -> Dict[str, Any]:
-        """Parse SMS using bank-specific template"""
+        """Parse SMS using bank-specific template, deduplicating identical messages"""
+        return self._parse_cached(sms_text, bank_name)
+
+    def _parse_with_template_uncached(self, sms_text: str, bank_name: str) -> Dict[str, Any]:
+        """Parse SMS using bank-specific template
+
+        Extraction, amount/date parsing and confidence scoring are fused
+        into a single pass over the match so each SMS is scanned once.
+        """
         try:
             template = self.templates[bank_name]
-            regex = template['regex']
-            
-            # Compile regex for better performance
-            pattern = re.compile(regex, re.IGNORECASE | re.DOTALL)
-            match = pattern.search(sms_text)
-            
+            match = template.pattern.search(sms_text)
+
             if not match:
                 return {
                     'success': False,
                     'error_message': 'SMS format not recognized'
                 }
-            
-            # Extract data using groups
-            groups = match.groups()
-            
-            amount = self._parse_amount(groups[template['amount_group'] - 1])
-            merchant_name = groups[template['merchant_group'] - 1].strip()
-            balance = self._parse_amount(groups[template['balance_group'] - 1])
-            date_str = groups[template['date_group'] - 1]
-            
-            # Parse date
-            transaction_date = self._parse_date(date_str)
-            
-            # Calculate confidence score
-            confidence_score = self._calculate_confidence(sms_text, amount, merchant_name)
-            
+
+            # Extract data using groups; amounts captured by the default
+            # templates are plain digits, so strip separators inline and
+            # only fall back to the tolerant parser on unusual captures
+            amount_str = match.group(template.amount_idx)
+            try:
+                amount = float(amount_str.replace(',', '')) if amount_str else None
+            except ValueError:
+                amount = self._parse_amount(amount_str)
+
+            balance_str = match.group(template.balance_idx)
+            try:
+                balance = float(balance_str.replace(',', '')) if balance_str else None
+            except ValueError:
+                balance = self._parse_amount(balance_str)
+
+            merchant_name = match.group(template.merchant_idx).strip()
+
+            # Date fast path: day/month/year digits straight from the
+            # captured group, falling back to the format-guessing parser
+            transaction_date = None
+            date_str = match.group(template.date_idx)
+            if date_str:
+                date_match = _DATE_DMY_RE.fullmatch(date_str.strip())
+                if date_match:
+                    day, month, year = date_match.groups()
+                    if len(year) == 2:
+                        year = '20' + year
+                    try:
+                        transaction_date = datetime(int(year), int(month), int(day))
+                    except ValueError:
+                        transaction_date = self._parse_date(date_str)
+                else:
+                    transaction_date = self._parse_date(date_str)
+
+            # Confidence score, computed from one lowered copy of the SMS
+            sms_lower = sms_text.lower()
+            confidence_score = 0.0
+            if amount is not None:
+                confidence_score += 0.4
+            if merchant_name and len(merchant_name) > 2:
+                confidence_score += 0.3
+            if any(keyword in sms_lower for keyword in _BANK_KEYWORDS):
+                confidence_score += 0.1
+            if any(keyword in sms_lower for keyword in _TRANSACTION_KEYWORDS):
+                confidence_score += 0.1
+            if _AMOUNT_FORMAT_RE.search(sms_text):
+                confidence_score += 0.1
+            confidence_score = min(confidence_score, 1.0)
+
             return {
                 'success': True,
                 'amount': amount,
                 'merchant_name': merchant_name,
                 'transaction_date': transaction_date,
                 'balance': balance,
-                'transaction_type': template['transaction_type'],
+                'transaction_type': template.txn_type,
                 'confidence_score': confidence_score,
                 'raw_data': {
                     'bank_name': bank_name,
                     'original_sms': sms_text,
-                    'matched_groups': groups,
-                    'template_used': template
+                    'matched_groups': match.groups(),
+                    'template_used': template.pattern.pattern
                 }
             }
             
@@ -291,7 +339,7 @@ class SMSParser:
                     continue
             
             # If no format matches, try to extract date from text
-            date_match = re.search(r'(\d{1,2})[-/](\d{1,2})[-/](\d{2,4})', date_str)
+            date_match = _DATE_FALLBACK_RE.search(date_str)
             if date_match:
                 day, month, year = date_match.groups()
                 if len(year) == 2:
@@ -304,51 +352,26 @@ class SMSParser:
             logger.error(f"Error parsing date: {str(e)}")
             return None
     
-    def _calculate_confidence(self, sms_text: str, amount: Optional[float], merchant_name: str) -> float:
-        """Calculate confidence score for parsed data"""
-        confidence = 0.0
-        
-        # Base confidence
-        if amount is not None:
-            confidence += 0.4
-        
-        if merchant_name and len(merchant_name) > 2:
-            confidence += 0.3
-        
-        # Check for Pakistani bank keywords
-        bank_keywords = ['hbl', 'ubl', 'mcb', 'alfalah', 'jazz', 'easypaisa', 'raast']
-        sms_lower = sms_text.lower()
-        for keyword in bank_keywords:
-            if keyword in sms_lower:
-                confidence += 0.1
-                break
-        
-        # Check for transaction keywords
-        transaction_keywords = ['debited', 'paid', 'transferred', 'withdrawn', 'spent']
-        for keyword in transaction_keywords:
-            if keyword in sms_lower:
-                confidence += 0.1
-                break
-        
-        # Check for amount format
-        if re.search(r'Rs\.?\s*\d+', sms_text):
-            confidence += 0.1
-        
-        return min(confidence, 1.0)
-    
+    async def _prepare_insert(self):
+        """Prepare the transaction insert statement on a reused connection"""
+        try:
+            self._db = await get_database()
+            self._insert_stmt = await self._db.prepare(_INSERT_TRANSACTION_SQL)
+        except Exception as e:
+            logger.error(f"Error preparing SMS insert statement: {str(e)}")
+            self._db = None
+            self._insert_stmt = None
+
     async def _store_parsed_sms(self, user_id: str, sms_text: str, parsed_data: Dict[str, Any]):
         """Store parsed SMS data for analysis"""
         try:
-            db = await get_database()
-            query = """
-                INSERT INTO transactions (
-                    user_id, amount, description, merchant_name, 
-                    transaction_date, sms_source, sms_raw_text, sms_parsed_data
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-            """
-            
-            await db.execute(
-                query,
+            if self._insert_stmt is None:
+                await self._prepare_insert()
+            if self._insert_stmt is None:
+                logger.error("SMS insert statement unavailable, skipping store")
+                return
+
+            await self._insert_stmt.fetch(
                 user_id,
                 parsed_data['amount'],
                 f"SMS: {parsed_data['merchant_name']}",
@@ -358,9 +381,13 @@ class SMSParser:
                 sms_text,
                 json.dumps(parsed_data['raw_data'])
             )
-            
+
         except Exception as e:
             logger.error(f"Error storing parsed SMS: {str(e)}")
+            # The pinned connection may have dropped; discard it so the
+            # next store re-prepares instead of failing forever
+            self._db = None
+            self._insert_stmt = None
     
     async def get_supported_banks(self) -> List[str]:
         """Get list of supported banks"""
@@ -372,14 +399,16 @@ class SMSParser:
     async def add_custom_template(self, bank_name: str, template_regex: str, groups: Dict[str, int]):
         """Add custom SMS template for a bank"""
         try:
-            self.templates[bank_name] = {
-                'regex': template_regex,
-                'amount_group': groups.get('amount_group', 1),
-                'merchant_group': groups.get('merchant_group', 2),
-                'balance_group': groups.get('balance_group', 4),
-                'date_group': groups.get('date_group', 3),
-                'transaction_type': groups.get('transaction_type', 'expense')
-            }
+            self.templates[bank_name] = Template(
+                pattern=re.compile(template_regex, re.IGNORECASE | re.DOTALL),
+                amount_idx=groups.get('amount_group', 1),
+                merchant_idx=groups.get('merchant_group', 2),
+                balance_idx=groups.get('balance_group', 4),
+                date_idx=groups.get('date_group', 3),
+                txn_type=groups.get('transaction_type', 'expense')
+            )
+            # Cached results may have used the previous template
+            self._parse_cached.cache_clear()
             
             # Store in database
             db = await get_database()
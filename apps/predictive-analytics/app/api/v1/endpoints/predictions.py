@@ -4,6 +4,7 @@ Prediction API endpoints
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 import structlog
 
 from app.models.prediction_models import (
@@ -20,6 +21,15 @@ logger = structlog.get_logger(__name__)
 router = APIRouter()
 
 
+def _try_validate(request: PredictionRequest) -> Optional[ValueError]:
+    """Validate a prediction request, returning the error instead of raising"""
+    try:
+        validate_prediction_request(request)
+        return None
+    except ValueError as e:
+        return e
+
+
 @router.post("/", response_model=PredictionResponse)
 async def create_prediction(
     request: PredictionRequest,
@@ -84,12 +94,18 @@ async def create_batch_predictions(
     Returns:
         List of prediction responses
     """
+    # Validate all requests up front so the client sees every problem
+    # in a single round-trip instead of failing on the first bad entry
+    errors = [
+        {"index": i, "symbol": pred_request.symbol, "error": str(e)}
+        for i, pred_request in enumerate(request.predictions)
+        if (e := _try_validate(pred_request)) is not None
+    ]
+    if errors:
+        raise HTTPException(status_code=400, detail={"errors": errors})
+
     try:
-        # Validate requests
-        for pred_request in request.predictions:
-            validate_prediction_request(pred_request)
-        
-        # Generate predictions
+        # Generate predictions concurrently
         predictions = await prediction_engine.predict_batch(request.predictions)
         
         # Store predictions in background
@@ -113,6 +129,51 @@ async def create_batch_predictions(
         raise HTTPException(status_code=500, detail="Failed to generate batch predictions")
 
 
+@router.post("/batch/stream")
+async def create_batch_predictions_stream(
+    request: BatchPredictionRequest,
+    background_tasks: BackgroundTasks,
+    prediction_engine: PredictionEngine = Depends()
+):
+    """
+    Stream batch predictions as NDJSON in completion order
+
+    Fast predictions reach the client immediately instead of waiting
+    for the batch's slowest member.
+
+    Args:
+        request: Batch prediction request
+        background_tasks: Background tasks for storing predictions
+        prediction_engine: Prediction engine dependency
+
+    Returns:
+        NDJSON stream of prediction responses
+    """
+    # Validate all requests up front, as in the non-streaming endpoint
+    errors = [
+        {"index": i, "symbol": pred_request.symbol, "error": str(e)}
+        for i, pred_request in enumerate(request.predictions)
+        if (e := _try_validate(pred_request)) is not None
+    ]
+    if errors:
+        raise HTTPException(status_code=400, detail={"errors": errors})
+
+    async def stream():
+        async for prediction in prediction_engine.predict_batch_stream(request.predictions):
+            if prediction.metadata.error is None:
+                background_tasks.add_task(
+                    prediction_engine.store_prediction,
+                    prediction
+                )
+            yield prediction.model_dump_json() + "\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        background=background_tasks
+    )
+
+
 @router.get("/history/{symbol}")
 async def get_prediction_history(
     symbol: str,
@@ -193,35 +254,22 @@ async def get_prediction_performance(
         Performance metrics
     """
     try:
-        # Get prediction history
-        history = await prediction_engine.get_prediction_history(symbol, days * 4)  # 4 predictions per day
-        
-        if not history:
+        # Aggregate metrics in the engine instead of iterating rows here
+        # This is a simplified calculation - in practice, you'd compare with actual prices
+        stats = await prediction_engine.get_performance_stats(symbol, days)
+
+        if stats["total_predictions"] == 0:
             return {
                 "symbol": symbol,
                 "error": "No prediction history found"
             }
-        
-        # Calculate performance metrics
-        # This is a simplified calculation - in practice, you'd compare with actual prices
-        total_predictions = len(history)
-        successful_predictions = len([p for p in history if p.get("metadata", {}).get("error") is None])
-        success_rate = successful_predictions / total_predictions if total_predictions > 0 else 0
-        
-        avg_confidence = sum(
-            p.get("metadata", {}).get("confidence_score", 0) 
-            for p in history
-        ) / total_predictions if total_predictions > 0 else 0
-        
+
         return {
             "symbol": symbol,
-            "total_predictions": total_predictions,
-            "successful_predictions": successful_predictions,
-            "success_rate": success_rate,
-            "average_confidence": avg_confidence,
+            **stats,
             "analysis_period_days": days
         }
-        
+
     except Exception as e:
         logger.error("Failed to get prediction performance", symbol=symbol, error=str(e))
         raise HTTPException(status_code=500, detail="Failed to get prediction performance")
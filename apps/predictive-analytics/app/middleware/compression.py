@@ -0,0 +1,89 @@
+"""
+Zstandard response compression middleware
+"""
+
+import zstandard
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class ZstdMiddleware(BaseHTTPMiddleware):
+    """Compress responses with zstd for clients that advertise it
+
+    zstd at low levels compresses the numeric prediction payloads
+    several times faster than gzip at a similar ratio. When a client
+    advertises zstd, gzip is hidden from the inner middleware so zstd
+    wins the negotiation; gzip-only clients fall through to
+    GZipMiddleware untouched. Unsized (streaming) responses are
+    compressed incrementally with a per-chunk flush so completion-order
+    delivery survives.
+    """
+
+    def __init__(self, app, minimum_size: int = 1000, level: int = 3):
+        super().__init__(app)
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        if "zstd" not in request.headers.get("accept-encoding", ""):
+            return await call_next(request)
+
+        # Advertise only zstd downstream so the inner GZipMiddleware
+        # leaves the response for us even when the client accepts both
+        request.scope["headers"] = [
+            (name, value)
+            for name, value in request.scope["headers"]
+            if name.lower() != b"accept-encoding"
+        ] + [(b"accept-encoding", b"zstd")]
+
+        response = await call_next(request)
+
+        if response.headers.get("content-encoding"):
+            return response
+
+        content_length = response.headers.get("content-length")
+        if content_length is None:
+            return self._compress_streaming(response)
+
+        if int(content_length) < self.minimum_size:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        # Compressor instances aren't safe to share across concurrent
+        # requests; construction is cheap
+        body = zstandard.ZstdCompressor(level=self.level, threads=-1).compress(body)
+        response.headers["content-encoding"] = "zstd"
+        if "accept-encoding" not in (response.headers.get("vary") or "").lower():
+            response.headers.add_vary_header("Accept-Encoding")
+        response.headers["content-length"] = str(len(body))
+        return Response(
+            content=body,
+            status_code=response.status_code,
+            headers=response.headers,
+            media_type=response.media_type
+        )
+
+    def _compress_streaming(self, response: Response) -> Response:
+        """Compress an unsized response chunk by chunk
+
+        Each source chunk is flushed through the compressor as its own
+        block, so clients keep receiving results (e.g. the NDJSON batch
+        stream) as they complete instead of after the whole body.
+        """
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        body_iterator = response.body_iterator
+
+        async def compressed():
+            async for chunk in body_iterator:
+                data = compressor.compress(chunk)
+                data += compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+                if data:
+                    yield data
+            yield compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+        response.body_iterator = compressed()
+        response.headers["content-encoding"] = "zstd"
+        if "accept-encoding" not in (response.headers.get("vary") or "").lower():
+            response.headers.add_vary_header("Accept-Encoding")
+        return response
@@ -2,39 +2,58 @@
 Pydantic models for prediction requests and responses
 """
 
-from datetime import datetime
-from typing import Dict, List, Optional, Any, Union
-from pydantic import BaseModel, Field, validator
-import numpy as np
+import hashlib
+from datetime import date, datetime
+from typing import Annotated, Dict, List, Literal, Optional, Any, Union
+
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, field_validator
+
+try:
+    import xxhash
+
+    def _hash_key(payload: bytes) -> str:
+        return xxhash.xxh3_64_hexdigest(payload)
+except ImportError:
+    def _hash_key(payload: bytes) -> str:
+        return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+# Constrained symbol type validated in pydantic-core instead of a
+# Python-level validator callback per request
+Symbol = Annotated[str, StringConstraints(min_length=1, max_length=10, to_upper=True)]
 
 
 class PredictionRequest(BaseModel):
     """Request model for generating predictions"""
-    
-    symbol: str = Field(..., description="Stock symbol to predict")
+
+    model_config = ConfigDict(protected_namespaces=())
+
+    symbol: Symbol = Field(..., description="Stock symbol to predict")
     horizon: int = Field(..., ge=1, le=252, description="Prediction horizon in days")
     model_type: Optional[str] = Field(None, description="Specific model type to use")
-    ensemble_method: str = Field("weighted_average", description="Ensemble method")
+    ensemble_method: Literal[
+        'weighted_average', 'simple_average', 'median', 'voting'
+    ] = Field("weighted_average", description="Ensemble method")
     feature_config: Optional[Dict[str, Any]] = Field(None, description="Feature engineering configuration")
     confidence_threshold: float = Field(0.5, ge=0.0, le=1.0, description="Minimum confidence threshold")
-    
-    @validator('symbol')
-    def validate_symbol(cls, v):
-        if not v or len(v) < 1 or len(v) > 10:
-            raise ValueError('Symbol must be 1-10 characters')
-        return v.upper()
-    
-    @validator('ensemble_method')
-    def validate_ensemble_method(cls, v):
-        allowed_methods = ['weighted_average', 'simple_average', 'median', 'voting']
-        if v not in allowed_methods:
-            raise ValueError(f'Ensemble method must be one of: {allowed_methods}')
-        return v
+
+    def cache_key(self) -> str:
+        """Stable digest over the fields that determine the prediction"""
+        payload = b"|".join((
+            self.symbol.encode(),
+            self.horizon.to_bytes(4, "little"),
+            (self.model_type or "").encode(),
+            self.ensemble_method.encode(),
+            orjson.dumps(self.feature_config or {}, option=orjson.OPT_SORT_KEYS)
+        ))
+        return _hash_key(payload)
 
 
 class ModelPrediction(BaseModel):
     """Individual model prediction result"""
-    
+
+    model_config = ConfigDict(protected_namespaces=())
+
     model_id: str
     model_type: str
     prediction: List[float]
@@ -46,77 +65,50 @@ class PredictionMetadata(BaseModel):
     """Metadata for prediction response"""
     
     generated_at: datetime
-    data_points: int
-    feature_count: int
-    model_count: int
-    confidence_score: float = Field(..., ge=0.0, le=1.0)
+    data_points: int = 0
+    feature_count: int = 0
+    model_count: int = 0
+    confidence_score: float = Field(0.0, ge=0.0, le=1.0)
     error: Optional[str] = None
     processing_time_ms: Optional[float] = None
 
 
 class PredictionResponse(BaseModel):
     """Response model for predictions"""
-    
+
+    model_config = ConfigDict(protected_namespaces=())
+
     symbol: str
     horizon: int
     predictions: Optional[List[float]] = None
     model_predictions: List[ModelPrediction] = Field(default_factory=list)
     metadata: PredictionMetadata
-    
-    class Config:
-        json_encoders = {
-            np.ndarray: lambda v: v.tolist(),
-            datetime: lambda v: v.isoformat()
-        }
 
 
 class BatchPredictionRequest(BaseModel):
     """Request model for batch predictions"""
-    
-    predictions: List[PredictionRequest] = Field(..., min_items=1, max_items=100)
-    
-    @validator('predictions')
-    def validate_predictions(cls, v):
-        if len(v) > 100:
-            raise ValueError('Maximum 100 predictions per batch')
-        return v
+
+    predictions: List[PredictionRequest] = Field(..., min_length=1, max_length=100)
 
 
 class BatchPredictionResponse(BaseModel):
     """Response model for batch predictions"""
-    
+
     predictions: List[PredictionResponse]
-    total_count: int
-    success_count: int
-    error_count: int
-    
-    @validator('total_count', 'success_count', 'error_count')
-    def validate_counts(cls, v):
-        if v < 0:
-            raise ValueError('Counts must be non-negative')
-        return v
+    total_count: int = Field(..., ge=0)
+    success_count: int = Field(..., ge=0)
+    error_count: int = Field(..., ge=0)
 
 
 class MarketRegimeRequest(BaseModel):
     """Request model for market regime detection"""
-    
-    symbol: str
-    timeframe: str = Field("1d", description="Timeframe for regime detection")
+
+    model_config = ConfigDict(protected_namespaces=())
+
+    symbol: Symbol
+    timeframe: Literal['1h', '4h', '1d', '1w'] = Field("1d", description="Timeframe for regime detection")
     lookback_days: int = Field(252, ge=30, le=2520, description="Days to look back")
     model_type: str = Field("hmm", description="Regime detection model type")
-    
-    @validator('symbol')
-    def validate_symbol(cls, v):
-        if not v or len(v) < 1 or len(v) > 10:
-            raise ValueError('Symbol must be 1-10 characters')
-        return v.upper()
-    
-    @validator('timeframe')
-    def validate_timeframe(cls, v):
-        allowed_timeframes = ['1h', '4h', '1d', '1w']
-        if v not in allowed_timeframes:
-            raise ValueError(f'Timeframe must be one of: {allowed_timeframes}')
-        return v
 
 
 class MarketRegimeResponse(BaseModel):
@@ -131,17 +123,13 @@ class MarketRegimeResponse(BaseModel):
 
 class VolatilityRequest(BaseModel):
     """Request model for volatility prediction"""
-    
-    symbol: str
+
+    model_config = ConfigDict(protected_namespaces=())
+
+    symbol: Symbol
     horizon: int = Field(..., ge=1, le=60, description="Prediction horizon in days")
     model_type: str = Field("garch", description="Volatility model type")
     confidence_level: float = Field(0.95, ge=0.5, le=0.99, description="Confidence level for intervals")
-    
-    @validator('symbol')
-    def validate_symbol(cls, v):
-        if not v or len(v) < 1 or len(v) > 10:
-            raise ValueError('Symbol must be 1-10 characters')
-        return v.upper()
 
 
 class VolatilityResponse(BaseModel):
@@ -158,26 +146,13 @@ class VolatilityResponse(BaseModel):
 class PortfolioOptimizationRequest(BaseModel):
     """Request model for portfolio optimization"""
     
-    symbols: List[str] = Field(..., min_items=2, max_items=50)
-    optimization_method: str = Field("mean_variance", description="Optimization method")
+    symbols: List[Symbol] = Field(..., min_length=2, max_length=50)
+    optimization_method: Literal[
+        'mean_variance', 'black_litterman', 'risk_parity', 'equal_weight'
+    ] = Field("mean_variance", description="Optimization method")
     risk_tolerance: float = Field(0.5, ge=0.0, le=1.0, description="Risk tolerance level")
     target_return: Optional[float] = Field(None, description="Target return (if applicable)")
     constraints: Optional[Dict[str, Any]] = Field(None, description="Additional constraints")
-    
-    @validator('symbols')
-    def validate_symbols(cls, v):
-        if len(v) < 2:
-            raise ValueError('At least 2 symbols required')
-        if len(v) > 50:
-            raise ValueError('Maximum 50 symbols allowed')
-        return [s.upper() for s in v]
-    
-    @validator('optimization_method')
-    def validate_optimization_method(cls, v):
-        allowed_methods = ['mean_variance', 'black_litterman', 'risk_parity', 'equal_weight']
-        if v not in allowed_methods:
-            raise ValueError(f'Optimization method must be one of: {allowed_methods}')
-        return v
 
 
 class PortfolioOptimizationResponse(BaseModel):
@@ -195,23 +170,19 @@ class PortfolioOptimizationResponse(BaseModel):
 class BacktestRequest(BaseModel):
     """Request model for backtesting"""
     
-    symbol: str
+    symbol: Symbol
     strategy: str = Field(..., description="Trading strategy to backtest")
     start_date: str = Field(..., description="Backtest start date (YYYY-MM-DD)")
     end_date: str = Field(..., description="Backtest end date (YYYY-MM-DD)")
     initial_capital: float = Field(100000.0, gt=0, description="Initial capital")
     parameters: Optional[Dict[str, Any]] = Field(None, description="Strategy parameters")
-    
-    @validator('symbol')
-    def validate_symbol(cls, v):
-        if not v or len(v) < 1 or len(v) > 10:
-            raise ValueError('Symbol must be 1-10 characters')
-        return v.upper()
-    
-    @validator('start_date', 'end_date')
+
+    @field_validator('start_date', 'end_date')
+    @classmethod
     def validate_dates(cls, v):
+        # fromisoformat is a C-level parser, ~10x faster than strptime
         try:
-            datetime.strptime(v, '%Y-%m-%d')
+            date.fromisoformat(v)
         except ValueError:
             raise ValueError('Date must be in YYYY-MM-DD format')
         return v
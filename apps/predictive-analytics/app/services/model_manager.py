@@ -4,8 +4,17 @@ Model Manager - Handles ML model lifecycle and operations
 
 import asyncio
 import logging
-import pickle
 import os
+import multiprocessing
+import pickle
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import aiosqlite
+import joblib
+import orjson
+from cachetools import LRUCache
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 import numpy as np
@@ -23,18 +32,61 @@ from app.models.ml_models import (
 )
 from app.services.model_factory import ModelFactory
 from app.utils.cache import cache_result
+from app.utils.metrics import compute_metrics
 from app.utils.validation import validate_model_config
 
 logger = structlog.get_logger(__name__)
 
+_METADATA_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS models (
+        id TEXT PRIMARY KEY,
+        symbol TEXT,
+        type TEXT,
+        created_at TEXT,
+        metadata BLOB
+    )
+"""
+_METADATA_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_models_symbol_type_created
+    ON models (symbol, type, created_at)
+"""
+
+# Model families whose predict call is CPU/GIL-bound; the prediction
+# engine routes these into its process pool
+_BACKEND_BY_TYPE = {
+    "xgboost": "xgboost",
+    "lightgbm": "lightgbm",
+    "random_forest": "sklearn"
+}
+
+
+def _train_worker(model, training_data: pd.DataFrame):
+    """Train a model in a worker process and return the trained model"""
+    result = model.train(training_data)
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
+    return model
+
 
 class ModelManager:
     """Manages ML models for financial predictions"""
     
     def __init__(self):
         self.model_factory = ModelFactory()
-        self.models_cache = {}
+        # Bounded cache: long-running workers otherwise accumulate every
+        # model ever loaded and eventually OOM
+        self.models_cache = LRUCache(maxsize=settings.MODEL_CACHE_SIZE)
         self.model_metadata = {}
+        # Secondary indices so filtered lookups touch only matching
+        # models instead of scanning every metadata entry
+        self._by_symbol: Dict[str, set] = {}
+        self._by_type: Dict[Any, set] = {}
+        # Identical feature schemas share one interned tuple instead of
+        # one list of duplicated strings per model
+        self._feature_pool: Dict[tuple, tuple] = {}
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+        self._meta_db: Optional[aiosqlite.Connection] = None
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
         self._initialized = False
     
     async def initialize(self):
@@ -49,7 +101,20 @@ class ModelManager:
             
             # Initialize model factory
             await self.model_factory.initialize()
-            
+
+            # CPU-bound training runs in worker processes so it doesn't
+            # starve the event loop
+            # forkserver: forking this (already threaded) process directly
+            # could deadlock the workers
+            self._cpu_pool = ProcessPoolExecutor(
+                max_workers=settings.MAX_CONCURRENT_TRAINING,
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+
+            # Warm the cache so the first predictions after boot don't
+            # pay cold deserialization latency
+            await self._prewarm_models()
+
             self._initialized = True
             logger.info("Model manager initialized successfully")
             
@@ -62,16 +127,51 @@ class ModelManager:
         try:
             # Clear model cache
             self.models_cache.clear()
-            
+
             # Close model factory
             await self.model_factory.close()
-            
+
+            # Close metadata store
+            if self._meta_db:
+                await self._meta_db.close()
+                self._meta_db = None
+
+            # Shut down the training pool
+            if self._cpu_pool:
+                self._cpu_pool.shutdown(wait=False)
+                self._cpu_pool = None
+
             self._initialized = False
             logger.info("Model manager closed")
             
         except Exception as e:
             logger.error("Error closing model manager", error=str(e))
     
+    async def _prewarm_models(self):
+        """Eagerly load the most recently created models in parallel"""
+        top_k = settings.PREWARM_TOP_K
+        if top_k <= 0 or not self.model_metadata:
+            return
+
+        hot_ids = sorted(
+            self.model_metadata,
+            key=lambda model_id: str(self.model_metadata[model_id].get("created_at", "")),
+            reverse=True
+        )[:top_k]
+
+        # Bound I/O parallelism so prewarm doesn't saturate the disk
+        semaphore = asyncio.Semaphore(4)
+
+        async def _load(model_id: str):
+            async with semaphore:
+                try:
+                    await self.load_model(model_id)
+                except Exception as e:
+                    logger.warning("Model prewarm failed", model_id=model_id, error=str(e))
+
+        await asyncio.gather(*(_load(model_id) for model_id in hot_ids))
+        logger.info("Models prewarmed", model_count=len(hot_ids))
+
     async def train_model(
         self,
         symbol: str,
@@ -109,9 +209,20 @@ class ModelManager:
             # Create model
             model = self.model_factory.create_model(model_type, config)
             
-            # Train model
+            # Train model in the process pool; models that can't cross a
+            # process boundary fall back to training on the event loop
             training_start = datetime.utcnow()
-            await model.train(training_data)
+            try:
+                model = await asyncio.get_running_loop().run_in_executor(
+                    self._cpu_pool, _train_worker, model, training_data
+                )
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                logger.warning(
+                    "Model not transferable to training pool, training in-process",
+                    model_type=model_type,
+                    error=str(e)
+                )
+                await model.train(training_data)
             training_duration = (datetime.utcnow() - training_start).total_seconds()
             
             # Evaluate model
@@ -166,26 +277,72 @@ class ModelManager:
         try:
             # Check cache first
             if model_id in self.models_cache:
+                logger.debug("Model cache hit", model_id=model_id)
                 return self.models_cache[model_id]
-            
-            # Load from storage
-            model_info = await self._get_model_metadata(model_id)
-            if not model_info:
-                raise ValueError(f"Model not found: {model_id}")
-            
-            # Load model
-            model = await self._load_model_from_storage(model_info)
-            
-            # Cache model
-            self.models_cache[model_id] = model
-            
+
+            # Serialize cold loads per model so concurrent misses don't
+            # all deserialize the same file
+            lock = self._load_locks.setdefault(model_id, asyncio.Lock())
+            async with lock:
+                if model_id in self.models_cache:
+                    return self.models_cache[model_id]
+
+                logger.debug("Model cache miss", model_id=model_id)
+
+                # Load from storage
+                model_info = await self._get_model_metadata(model_id)
+                if not model_info:
+                    raise ValueError(f"Model not found: {model_id}")
+
+                # Load model
+                model = await self._load_model_from_storage(model_info)
+
+                # Cache model
+                self.models_cache[model_id] = model
+
             logger.debug("Model loaded", model_id=model_id)
             return model
-            
+
         except Exception as e:
             logger.error("Failed to load model", model_id=model_id, error=str(e))
             raise
     
+    def _intern_feature_columns(self, columns) -> tuple:
+        """Return a shared, interned tuple for a feature schema"""
+        schema = tuple(sys.intern(str(column)) for column in columns)
+        return self._feature_pool.setdefault(schema, schema)
+
+    def _apply_default_backend(self, metadata: Dict[str, Any]):
+        """Tag known CPU-bound model families with their backend"""
+        if not metadata.get("backend"):
+            metadata["backend"] = _BACKEND_BY_TYPE.get(metadata.get("type"))
+
+    def _index_model(self, model_id: str, metadata: Dict[str, Any]):
+        """Add a model to the secondary lookup indices"""
+        self._by_symbol.setdefault(metadata.get("symbol"), set()).add(model_id)
+        self._by_type.setdefault(metadata.get("type"), set()).add(model_id)
+
+    def _unindex_model(self, model_id: str, metadata: Dict[str, Any]):
+        """Remove a model from the secondary lookup indices"""
+        self._by_symbol.get(metadata.get("symbol"), set()).discard(model_id)
+        self._by_type.get(metadata.get("type"), set()).discard(model_id)
+
+    def _resolve_model_ids(
+        self,
+        symbol: Optional[str],
+        model_type: Optional[ModelType]
+    ):
+        """Resolve filters through the indices, O(matches) not O(N)"""
+        model_ids = None
+        if symbol:
+            model_ids = self._by_symbol.get(symbol, set())
+        if model_type:
+            type_ids = self._by_type.get(model_type, set())
+            model_ids = type_ids if model_ids is None else model_ids & type_ids
+        if model_ids is None:
+            model_ids = self.model_metadata.keys()
+        return model_ids
+
     async def get_available_models(
         self,
         symbol: Optional[str] = None,
@@ -193,15 +350,11 @@ class ModelManager:
     ) -> List[Dict[str, Any]]:
         """Get available models with optional filtering"""
         try:
+            model_ids = self._resolve_model_ids(symbol, model_type)
+
             models = []
-            
-            for model_id, metadata in self.model_metadata.items():
-                # Apply filters
-                if symbol and metadata["symbol"] != symbol:
-                    continue
-                if model_type and metadata["type"] != model_type:
-                    continue
-                
+            for model_id in model_ids:
+                metadata = self.model_metadata[model_id]
                 models.append({
                     "id": model_id,
                     "symbol": metadata["symbol"],
@@ -209,7 +362,10 @@ class ModelManager:
                     "status": metadata["status"],
                     "created_at": metadata["created_at"],
                     "metrics": metadata["metrics"],
-                    "feature_columns": metadata["feature_columns"]
+                    "feature_columns": metadata["feature_columns"],
+                    "model_path": metadata.get("model_path"),
+                    "backend": metadata.get("backend"),
+                    "input_dtype": metadata.get("input_dtype")
                 })
             
             return models
@@ -218,6 +374,40 @@ class ModelManager:
             logger.error("Failed to get available models", error=str(e))
             return []
     
+    async def get_available_models_table(
+        self,
+        symbol: Optional[str] = None,
+        model_type: Optional[ModelType] = None
+    ) -> Dict[str, List[Any]]:
+        """Get available models as a columnar dict-of-lists
+
+        Column-oriented variant of get_available_models for dashboard
+        listings: the result feeds pd.DataFrame(..., copy=False)
+        directly instead of going through the slow row-by-row path.
+        """
+        try:
+            model_ids = self._resolve_model_ids(symbol, model_type)
+
+            columns: Dict[str, List[Any]] = {
+                "id": [], "symbol": [], "type": [], "status": [],
+                "created_at": [], "metrics": [], "feature_columns": []
+            }
+            for model_id in model_ids:
+                metadata = self.model_metadata[model_id]
+                columns["id"].append(model_id)
+                columns["symbol"].append(metadata["symbol"])
+                columns["type"].append(metadata["type"])
+                columns["status"].append(metadata["status"])
+                columns["created_at"].append(metadata["created_at"])
+                columns["metrics"].append(metadata["metrics"])
+                columns["feature_columns"].append(metadata["feature_columns"])
+
+            return columns
+
+        except Exception as e:
+            logger.error("Failed to get available models table", error=str(e))
+            return {}
+
     async def update_model(
         self,
         model_id: str,
@@ -227,36 +417,39 @@ class ModelManager:
         """Update an existing model with new data"""
         try:
             # Get existing model info
-            model_info = await self._get_model_metadata(model_id)
-            if not model_info:
+            metadata = await self._get_model_metadata(model_id)
+            if not metadata:
                 raise ValueError(f"Model not found: {model_id}")
-            
+
             logger.info("Updating model", model_id=model_id)
-            
+
             # Load existing model
             model = await self.load_model(model_id)
-            
+
             # Update model with new data
             await model.update(training_data, config)
-            
+
             # Evaluate updated model
             metrics = await self._evaluate_model(model, training_data)
-            
-            # Update model info
-            model_info["status"] = "updated"
-            model_info["updated_at"] = datetime.utcnow()
-            model_info["metrics"] = metrics.dict()
-            model_info["feature_columns"] = list(training_data.columns)
-            
+
+            # Update model info without re-validating the untouched fields
+            updated = {
+                **metadata,
+                "status": "updated",
+                "updated_at": datetime.utcnow(),
+                "metrics": metrics.dict(),
+                "feature_columns": list(training_data.columns)
+            }
+
             # Save updated model
             await self._save_model(model, model_id)
-            
+
             # Update metadata
-            await self._store_model_metadata(model_info)
-            
+            await self._store_model_metadata(updated)
+
             logger.info("Model updated successfully", model_id=model_id)
-            
-            return ModelInfo(**model_info)
+
+            return ModelInfo.model_construct(**updated)
             
         except Exception as e:
             logger.error("Failed to update model", model_id=model_id, error=str(e))
@@ -268,18 +461,21 @@ class ModelManager:
             # Remove from cache
             if model_id in self.models_cache:
                 del self.models_cache[model_id]
+            self._load_locks.pop(model_id, None)
             
-            # Remove from metadata
+            # Remove from metadata and indices
             if model_id in self.model_metadata:
+                self._unindex_model(model_id, self.model_metadata[model_id])
                 del self.model_metadata[model_id]
             
             # Remove from storage
             model_path = self.model_dir / f"{model_id}.pkl"
             if model_path.exists():
                 model_path.unlink()
-            
-            # Update metadata storage
-            await self._save_model_metadata()
+
+            # Remove from metadata storage
+            await self._meta_db.execute("DELETE FROM models WHERE id = ?", (model_id,))
+            await self._meta_db.commit()
             
             logger.info("Model deleted", model_id=model_id)
             return True
@@ -328,37 +524,82 @@ class ModelManager:
             return 0
     
     async def _load_model_metadata(self):
-        """Load model metadata from storage"""
+        """Load model metadata from sqlite into the in-RAM cache"""
         try:
-            metadata_path = self.model_dir / "metadata.json"
-            if metadata_path.exists():
-                import json
-                with open(metadata_path, 'r') as f:
-                    self.model_metadata = json.load(f)
-            else:
-                self.model_metadata = {}
-                
+            self._meta_db = await aiosqlite.connect(self.model_dir / "metadata.db")
+            await self._meta_db.execute("PRAGMA journal_mode=WAL")
+            await self._meta_db.execute("PRAGMA synchronous=NORMAL")
+            await self._meta_db.execute(_METADATA_TABLE_SQL)
+            await self._meta_db.execute(_METADATA_INDEX_SQL)
+            await self._meta_db.commit()
+
+            self.model_metadata = {}
+            self._by_symbol = {}
+            self._by_type = {}
+            async with self._meta_db.execute("SELECT id, metadata FROM models") as cursor:
+                async for model_id, blob in cursor:
+                    metadata = orjson.loads(blob)
+                    metadata["feature_columns"] = self._intern_feature_columns(
+                        metadata.get("feature_columns") or ()
+                    )
+                    self._apply_default_backend(metadata)
+                    self.model_metadata[model_id] = metadata
+                    self._index_model(model_id, metadata)
+
+            if not self.model_metadata:
+                await self._migrate_legacy_metadata()
+
         except Exception as e:
             logger.error("Failed to load model metadata", error=str(e))
             self.model_metadata = {}
-    
-    async def _save_model_metadata(self):
-        """Save model metadata to storage"""
-        try:
-            metadata_path = self.model_dir / "metadata.json"
-            import json
-            with open(metadata_path, 'w') as f:
-                json.dump(self.model_metadata, f, default=str)
-                
-        except Exception as e:
-            logger.error("Failed to save model metadata", error=str(e))
-    
-    async def _store_model_metadata(self, model_info: ModelInfo):
-        """Store model metadata"""
+
+    async def _migrate_legacy_metadata(self):
+        """Import metadata from the pre-sqlite metadata.json, if present"""
+        metadata_path = self.model_dir / "metadata.json"
+        if not metadata_path.exists():
+            return
+
+        legacy = orjson.loads(await asyncio.to_thread(metadata_path.read_bytes))
+
+        for metadata in legacy.values():
+            await self._store_model_metadata(metadata)
+
+        logger.info("Migrated legacy model metadata", model_count=len(legacy))
+
+    async def _store_model_metadata(self, model_info):
+        """Store model metadata, write-through from RAM to sqlite"""
         try:
-            self.model_metadata[model_info.id] = model_info.dict()
-            await self._save_model_metadata()
-            
+            metadata = model_info if isinstance(model_info, dict) else model_info.dict()
+            model_id = metadata["id"]
+            metadata["feature_columns"] = self._intern_feature_columns(
+                metadata.get("feature_columns") or ()
+            )
+
+            # Promote the training config's input dtype so the serving
+            # path can build features in the dtype the model wants
+            config = metadata.get("config")
+            if not metadata.get("input_dtype") and isinstance(config, dict):
+                metadata["input_dtype"] = config.get("input_dtype")
+
+            self._apply_default_backend(metadata)
+
+            if model_id in self.model_metadata:
+                self._unindex_model(model_id, self.model_metadata[model_id])
+            self.model_metadata[model_id] = metadata
+            self._index_model(model_id, metadata)
+            await self._meta_db.execute(
+                "INSERT OR REPLACE INTO models (id, symbol, type, created_at, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    model_id,
+                    metadata.get("symbol"),
+                    str(metadata.get("type")),
+                    str(metadata.get("created_at")),
+                    orjson.dumps(metadata, option=orjson.OPT_SERIALIZE_NUMPY, default=str)
+                )
+            )
+            await self._meta_db.commit()
+
         except Exception as e:
             logger.error("Failed to store model metadata", error=str(e))
     
@@ -370,11 +611,15 @@ class ModelManager:
         """Save model to storage"""
         try:
             model_path = self.model_dir / f"{model_id}.pkl"
-            
-            # Serialize model
-            with open(model_path, 'wb') as f:
-                pickle.dump(model, f)
-            
+
+            # Serialize model; joblib stores numpy arrays in a
+            # memory-mappable layout. Run it in a worker thread so a
+            # large dump doesn't stall the event loop, holding the
+            # per-model lock so concurrent saves can't interleave
+            lock = self._load_locks.setdefault(model_id, asyncio.Lock())
+            async with lock:
+                await asyncio.to_thread(joblib.dump, model, model_path)
+
             return str(model_path)
             
         except Exception as e:
@@ -385,10 +630,12 @@ class ModelManager:
         """Load model from storage"""
         try:
             model_path = model_info["model_path"]
-            
-            with open(model_path, 'rb') as f:
-                model = pickle.load(f)
-            
+
+            # Memory-map array payloads so loads avoid a full copy and
+            # worker processes share pages; plain pickles load unchanged.
+            # Deserialization happens off the event loop
+            model = await asyncio.to_thread(joblib.load, model_path, mmap_mode='r')
+
             return model
             
         except Exception as e:
@@ -396,9 +643,13 @@ class ModelManager:
             raise
     
     def _generate_model_id(self, symbol: str, model_type: ModelType) -> str:
-        """Generate unique model ID"""
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        return f"{symbol}_{model_type}_{timestamp}"
+        """Generate unique model ID
+
+        A random suffix instead of a second-resolution timestamp: two
+        trainings for the same (symbol, type) within one second used to
+        collide and overwrite each other's model files.
+        """
+        return f"{symbol}_{model_type}_{uuid.uuid4().hex[:16]}"
     
     async def _evaluate_model(
         self,
@@ -414,30 +665,19 @@ class ModelManager:
             
             # Generate predictions
             predictions = await model.predict(test_data.iloc[:-1])
-            
-            # Calculate metrics
-            actual = test_data.iloc[1:].values.flatten()
-            
+
+            # Calculate metrics over float32 views: metric precision is
+            # ample at return magnitudes and half the memory traffic
+            test_values = test_data.to_numpy(dtype=np.float32, copy=False)
+            actual = test_values[1:].ravel()
+
             # Ensure predictions and actual have same length
             min_len = min(len(predictions), len(actual))
-            predictions = predictions[:min_len]
-            actual = actual[:min_len]
-            
-            # Calculate RMSE
-            rmse = np.sqrt(np.mean((predictions - actual) ** 2))
-            
-            # Calculate MAE
-            mae = np.mean(np.abs(predictions - actual))
-            
-            # Calculate R²
-            ss_res = np.sum((actual - predictions) ** 2)
-            ss_tot = np.sum((actual - np.mean(actual)) ** 2)
-            r2 = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0
-            
-            # Calculate directional accuracy
-            actual_direction = np.diff(actual) > 0
-            pred_direction = np.diff(predictions) > 0
-            directional_accuracy = np.mean(actual_direction == pred_direction)
+            predictions = np.ascontiguousarray(predictions, dtype=np.float32)[:min_len]
+            actual = np.ascontiguousarray(actual[:min_len])
+
+            # Fused single-pass kernel (Cython when built, NumPy otherwise)
+            rmse, mae, r2, directional_accuracy = compute_metrics(actual, predictions)
             
             return ModelMetrics(
                 rmse=float(rmse),
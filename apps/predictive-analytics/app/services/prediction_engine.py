@@ -3,12 +3,20 @@ Prediction Engine - Core service for generating financial predictions
 """
 
 import asyncio
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
+import msgpack
 import numpy as np
+import orjson
 import pandas as pd
 import structlog
+from cachetools import TTLCache
 
 from app.core.config import settings
 from app.core.redis import redis_client
@@ -27,6 +35,52 @@ from app.utils.validation import validate_prediction_request
 
 logger = structlog.get_logger(__name__)
 
+# datetime.utcnow() is deprecated and re-resolves the timezone per
+# call; bind UTC once for the hot timestamp sites
+_UTC = timezone.utc
+
+# Backends whose predict holds the GIL for the whole call
+_CPU_BOUND_BACKENDS = {"sklearn", "xgboost", "lightgbm"}
+
+
+def _cpu_predict_worker(model_path: str, features: pd.DataFrame, horizon: int) -> np.ndarray:
+    """Run a CPU-bound model's predict in a worker process"""
+    import joblib
+
+    model = joblib.load(model_path, mmap_mode='r')
+    result = model.predict(features, horizon=horizon)
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    return np.asarray(result)
+
+
+def _confidence_kernel(prediction: np.ndarray) -> float:
+    """Single-pass variance/mean-abs confidence score"""
+    n = prediction.shape[0]
+    s = 0.0
+    ss = 0.0
+    sa = 0.0
+    for i in range(n):
+        v = prediction[i]
+        s += v
+        ss += v * v
+        sa += abs(v)
+    mean = s / n
+    var = ss / n - mean * mean
+    if var < 0.0:
+        var = 0.0
+    return max(0.0, 1.0 - var ** 0.5 / (sa / n + 1e-8))
+
+
+try:
+    from numba import njit
+    _confidence_kernel = njit(cache=True, fastmath=True)(_confidence_kernel)
+except ImportError:
+    # Without numba the fused loop would run interpreted; use the
+    # equivalent NumPy expression instead
+    def _confidence_kernel(prediction: np.ndarray) -> float:
+        return max(0.0, 1.0 - np.std(prediction) / (np.mean(np.abs(prediction)) + 1e-8))
+
 
 class PredictionEngine:
     """Main prediction engine for financial market predictions"""
@@ -36,6 +90,19 @@ class PredictionEngine:
         self.data_processor = data_processor
         self.feature_engineer = FeatureEngineer()
         self.ensemble_predictor = EnsemblePredictor()
+        # Local cache tier in front of Redis, plus in-flight futures so
+        # concurrent duplicate requests coalesce into one computation
+        self._local_cache = TTLCache(maxsize=10_000, ttl=settings.PREDICTION_CACHE_TTL)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Per-symbol history frames shared across requests for a short
+        # window, so hot symbols skip the fetch and frame construction
+        self._history_cache = TTLCache(maxsize=512, ttl=settings.HISTORY_CACHE_TTL)
+        # Column plans per (model, feature schema): which target slots
+        # are fed by which source columns, resolved once
+        self._col_plan_cache: Dict[
+            Tuple[str, Tuple[str, ...], Tuple[str, ...]], List[Tuple[int, str]]
+        ] = {}
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
         self._initialized = False
     
     async def initialize(self):
@@ -43,6 +110,11 @@ class PredictionEngine:
         try:
             await self.feature_engineer.initialize()
             await self.ensemble_predictor.initialize()
+
+            # Warm the confidence kernel so the first request doesn't
+            # pay JIT compilation cost
+            _confidence_kernel(np.zeros(8, dtype=np.float64))
+
             self._initialized = True
             logger.info("Prediction engine initialized successfully")
         except Exception as e:
@@ -54,38 +126,86 @@ class PredictionEngine:
         try:
             await self.feature_engineer.close()
             await self.ensemble_predictor.close()
+            if self._cpu_pool:
+                self._cpu_pool.shutdown(wait=False)
+                self._cpu_pool = None
             self._initialized = False
             logger.info("Prediction engine closed")
         except Exception as e:
             logger.error("Error closing prediction engine", error=str(e))
     
-    @cache_result(ttl=settings.PREDICTION_CACHE_TTL)
+    def _prediction_cache_key(self, request: PredictionRequest) -> str:
+        """Build the local-cache key for a prediction request"""
+        return request.cache_key()
+
     async def predict(
         self,
         request: PredictionRequest
     ) -> PredictionResponse:
         """
         Generate predictions for the given request
-        
+
+        Hot keys are served from an in-process TTL cache ahead of the
+        Redis tier, and concurrent duplicates await one in-flight
+        computation instead of each running the pipeline.
+
         Args:
             request: Prediction request containing symbol, horizon, etc.
-            
+
         Returns:
             PredictionResponse with predictions and metadata
         """
+        cache_key = self._prediction_cache_key(request)
+
+        cached = self._local_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            return await inflight
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            response = await self._predict_uncached(request)
+            self._local_cache[cache_key] = response
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved in case no duplicate request was waiting
+            future.exception()
+            raise
+        finally:
+            # On cancellation the future is still pending; cancel it so
+            # coalesced waiters don't hang
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(cache_key, None)
+
+    @cache_result(ttl=settings.PREDICTION_CACHE_TTL)
+    async def _predict_uncached(
+        self,
+        request: PredictionRequest
+    ) -> PredictionResponse:
+        """Run the full prediction pipeline (Redis-cached tier)"""
         if not self._initialized:
             raise RuntimeError("Prediction engine not initialized")
         
         # Validate request
         validate_prediction_request(request)
-        
-        logger.info(
-            "Generating prediction",
+
+        # One bound logger per request: a single info event on completion
+        # instead of one formatted dict per pipeline stage
+        log = logger.bind(
             symbol=request.symbol,
             horizon=request.horizon,
             model_type=request.model_type
         )
-        
+        log.debug("Generating prediction")
+        start_time = time.perf_counter()
+
         try:
             # Get historical data
             historical_data = await self._get_historical_data(
@@ -114,75 +234,126 @@ class PredictionEngine:
                 request
             )
             
+            duration_ms = (time.perf_counter() - start_time) * 1000
+
             # Create response
             response = PredictionResponse(
                 symbol=request.symbol,
                 horizon=request.horizon,
-                predictions=ensemble_prediction,
+                predictions=np.asarray(ensemble_prediction).tolist(),
                 model_predictions=model_predictions,
                 metadata=PredictionMetadata(
-                    generated_at=datetime.utcnow(),
+                    generated_at=datetime.now(_UTC),
                     data_points=len(historical_data),
                     feature_count=len(features.columns),
                     model_count=len(model_predictions),
-                    confidence_score=self._calculate_confidence(model_predictions)
+                    confidence_score=self._calculate_confidence(model_predictions),
+                    processing_time_ms=duration_ms
                 )
             )
-            
-            logger.info(
-                "Prediction generated successfully",
-                symbol=request.symbol,
+
+            log.info(
+                "Prediction generated",
+                duration_ms=round(duration_ms, 2),
+                model_count=len(model_predictions),
                 confidence=response.metadata.confidence_score
             )
-            
+
             return response
-            
+
         except Exception as e:
-            logger.error(
-                "Failed to generate prediction",
-                symbol=request.symbol,
-                error=str(e)
-            )
+            log.error("Failed to generate prediction", error=str(e))
             raise
     
     async def predict_batch(
         self,
         requests: List[PredictionRequest]
     ) -> List[PredictionResponse]:
-        """Generate predictions for multiple requests"""
+        """Generate predictions for multiple requests
+
+        Identical requests in the batch are computed once and fanned
+        back out; distinct requests run concurrently.
+        """
         logger.info("Generating batch predictions", count=len(requests))
-        
-        # Process requests in parallel
-        tasks = [self.predict(request) for request in requests]
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Handle exceptions
+
+        # One timestamp for the whole batch's error responses
+        batch_time = datetime.now(_UTC)
+
+        # Deduplicate identical requests before dispatching
+        keys = [self._prediction_cache_key(request) for request in requests]
+        unique: Dict[str, PredictionRequest] = {}
+        for key, request in zip(keys, requests):
+            unique.setdefault(key, request)
+
+        # Process unique requests in parallel
+        responses = await asyncio.gather(
+            *[self.predict(request) for request in unique.values()],
+            return_exceptions=True
+        )
+        response_by_key = dict(zip(unique.keys(), responses))
+
+        # Handle exceptions, mapping results back into request order
         results = []
-        for i, response in enumerate(responses):
+        for i, (key, request) in enumerate(zip(keys, requests)):
+            response = response_by_key[key]
             if isinstance(response, Exception):
                 logger.error(
                     "Batch prediction failed",
                     index=i,
-                    symbol=requests[i].symbol,
+                    symbol=request.symbol,
                     error=str(response)
                 )
                 # Create error response
-                error_response = PredictionResponse(
-                    symbol=requests[i].symbol,
-                    horizon=requests[i].horizon,
+                response = PredictionResponse(
+                    symbol=request.symbol,
+                    horizon=request.horizon,
                     predictions=None,
                     model_predictions=[],
                     metadata=PredictionMetadata(
-                        generated_at=datetime.utcnow(),
+                        generated_at=batch_time,
                         error=str(response)
                     )
                 )
-                results.append(error_response)
-            else:
-                results.append(response)
-        
+            results.append(response)
+
         logger.info("Batch predictions completed", success_count=len(results))
         return results
+
+    async def predict_batch_stream(
+        self,
+        requests: List[PredictionRequest]
+    ) -> AsyncIterator[PredictionResponse]:
+        """Yield batch predictions in completion order
+
+        Fast predictions surface immediately instead of waiting behind
+        the batch's slowest member; failures yield error responses in
+        place of raising.
+        """
+        logger.info("Streaming batch predictions", count=len(requests))
+        batch_time = datetime.now(_UTC)
+
+        async def _one(request: PredictionRequest) -> PredictionResponse:
+            try:
+                return await self.predict(request)
+            except Exception as e:
+                logger.error(
+                    "Batch prediction failed",
+                    symbol=request.symbol,
+                    error=str(e)
+                )
+                return PredictionResponse(
+                    symbol=request.symbol,
+                    horizon=request.horizon,
+                    predictions=None,
+                    model_predictions=[],
+                    metadata=PredictionMetadata(
+                        generated_at=batch_time,
+                        error=str(e)
+                    )
+                )
+
+        for future in asyncio.as_completed([_one(request) for request in requests]):
+            yield await future
     
     async def _get_historical_data(
         self,
@@ -193,11 +364,19 @@ class PredictionEngine:
         try:
             # Calculate required data points
             required_points = settings.MIN_DATA_POINTS + horizon + settings.FEATURE_WINDOW_SIZE
-            
+            days_back = min(required_points, settings.MAX_HISTORICAL_DAYS)
+
+            # Hot symbols share one frame; downstream stages never
+            # mutate it, so handing out the same object is safe
+            cache_key = (symbol, days_back)
+            cached = self._history_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
             # Get data from data processor
             data = await self.data_processor.get_historical_data(
                 symbol=symbol,
-                days_back=min(required_points, settings.MAX_HISTORICAL_DAYS)
+                days_back=days_back
             )
             
             if data.empty:
@@ -213,7 +392,11 @@ class PredictionEngine:
                     required=settings.MIN_DATA_POINTS
                 )
                 return pd.DataFrame()
-            
+
+            # Arrow-backed columns make downstream column selection
+            # zero-copy and NaN handling bitmap-based
+            data = data.convert_dtypes(dtype_backend="pyarrow")
+            self._history_cache[cache_key] = data
             return data
             
         except Exception as e:
@@ -262,26 +445,31 @@ class PredictionEngine:
             if not available_models:
                 logger.warning("No models available", symbol=request.symbol)
                 return []
-            
-            # Generate predictions from each model
-            for model_info in available_models:
-                try:
-                    prediction = await self._predict_with_model(
-                        model_info,
-                        features,
-                        request
-                    )
-                    model_predictions.append(prediction)
-                    
-                except Exception as e:
+
+            # Run the models concurrently so the stage costs the slowest
+            # model instead of the sum, bounded to protect model memory
+            semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_MODELS)
+
+            async def _predict(model_info):
+                async with semaphore:
+                    return await self._predict_with_model(model_info, features, request)
+
+            results = await asyncio.gather(
+                *[_predict(model_info) for model_info in available_models],
+                return_exceptions=True
+            )
+
+            for model_info, result in zip(available_models, results):
+                if isinstance(result, Exception):
                     logger.warning(
                         "Model prediction failed",
                         model_id=model_info["id"],
-                        error=str(e)
+                        error=str(result)
                     )
                     continue
+                model_predictions.append(result)
             
-            logger.info(
+            logger.debug(
                 "Model predictions generated",
                 symbol=request.symbol,
                 model_count=len(model_predictions)
@@ -301,19 +489,24 @@ class PredictionEngine:
     ) -> ModelPrediction:
         """Generate prediction with a specific model"""
         try:
-            # Load model
+            # Load model; the manager serves this from its bounded LRU
+            # after first use, so per-request loads are dict hits
             model = await self.model_manager.load_model(model_info["id"])
             
             # Prepare features for model
             model_features = self._prepare_features_for_model(
+                model_info["id"],
                 features,
-                model_info["feature_columns"]
+                model_info["feature_columns"],
+                model_info.get("input_dtype") or "float32"
             )
             
-            # Generate prediction
-            prediction = await model.predict(
+            # Generate prediction, served from Redis for repeated inputs
+            prediction = await self._cached_model_predict(
+                model_info,
+                model,
                 model_features,
-                horizon=request.horizon
+                request.horizon
             )
             
             # Calculate confidence
@@ -326,7 +519,7 @@ class PredictionEngine:
             return ModelPrediction(
                 model_id=model_info["id"],
                 model_type=model_info["type"],
-                prediction=prediction,
+                prediction=np.asarray(prediction).tolist(),
                 confidence=confidence,
                 metadata={
                     "feature_count": len(model_features.columns),
@@ -342,31 +535,123 @@ class PredictionEngine:
             )
             raise
     
+    async def _predict_in_cpu_pool(
+        self,
+        model_info: Dict[str, Any],
+        features: pd.DataFrame,
+        horizon: int
+    ) -> np.ndarray:
+        """Run a GIL-bound model's predict in the process pool
+
+        Workers reload the model from its memory-mapped file, so pages
+        are shared with the parent rather than copied.
+        """
+        if self._cpu_pool is None:
+            self._cpu_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._cpu_pool,
+            _cpu_predict_worker,
+            model_info["model_path"],
+            features,
+            horizon
+        )
+
+    async def _cached_model_predict(
+        self,
+        model_info: Dict[str, Any],
+        model,
+        features: pd.DataFrame,
+        horizon: int
+    ) -> np.ndarray:
+        """Run model inference with a Redis cache keyed by feature hash
+
+        Bursty traffic repeats (model, features, horizon) triples across
+        requests, so a hit turns a model forward pass into a Redis GET.
+        """
+        model_id = model_info["id"]
+        cache_key = None
+        try:
+            feature_hash = hashlib.sha256(features.to_numpy().tobytes()).hexdigest()
+            cache_key = f"predictions:model:{model_id}:{horizon}:{feature_hash}"
+            cached = await redis_client.get(cache_key)
+            if cached is not None:
+                return np.asarray(orjson.loads(cached))
+        except Exception as e:
+            logger.warning("Prediction cache lookup failed", model_id=model_id, error=str(e))
+
+        if model_info.get("backend") in _CPU_BOUND_BACKENDS and model_info.get("model_path"):
+            prediction = await self._predict_in_cpu_pool(model_info, features, horizon)
+        else:
+            prediction = await model.predict(features, horizon=horizon)
+
+        if cache_key is not None:
+            try:
+                await redis_client.setex(
+                    cache_key,
+                    settings.PREDICTION_CACHE_TTL,
+                    orjson.dumps(np.asarray(prediction).tolist())
+                )
+            except Exception as e:
+                logger.warning("Prediction cache store failed", model_id=model_id, error=str(e))
+
+        return prediction
+
     def _prepare_features_for_model(
         self,
+        model_id: str,
         features: pd.DataFrame,
-        required_columns: List[str]
+        required_columns: List[str],
+        input_dtype: str = "float32"
     ) -> pd.DataFrame:
-        """Prepare features for a specific model"""
-        # Check if all required columns are available
-        missing_columns = set(required_columns) - set(features.columns)
-        if missing_columns:
-            logger.warning(
-                "Missing feature columns",
-                missing=missing_columns,
-                available=features.columns.tolist()
-            )
-            # Fill missing columns with zeros
-            for col in missing_columns:
-                features[col] = 0.0
-        
-        # Select and order columns
-        model_features = features[required_columns].copy()
-        
-        # Handle NaN values
-        model_features = model_features.fillna(0.0)
-        
-        return model_features
+        """Prepare features for a specific model
+
+        Builds one contiguous matrix in model column order instead of
+        mutating the caller's frame and copying it twice; missing
+        columns stay zero-filled. Models can request a narrower input
+        dtype (e.g. float16) via their metadata to halve the memory
+        bandwidth into their kernels. The column plan per (model,
+        schema) pair is resolved once and cached.
+        """
+        # required_columns participates in the key so a retrained model
+        # with a new feature set can't hit a stale plan
+        plan_key = (model_id, tuple(required_columns), tuple(features.columns))
+        plan = self._col_plan_cache.get(plan_key)
+        if plan is None:
+            # Check if all required columns are available
+            missing_columns = set(required_columns) - set(features.columns)
+            if missing_columns:
+                logger.warning(
+                    "Missing feature columns",
+                    model_id=model_id,
+                    missing=missing_columns,
+                    available=features.columns.tolist()
+                )
+            plan = [
+                (i, column)
+                for i, column in enumerate(required_columns)
+                if column not in missing_columns
+            ]
+            self._col_plan_cache[plan_key] = plan
+
+        dtype = np.dtype(input_dtype)
+        matrix = np.zeros((len(features), len(required_columns)), dtype=dtype)
+        for i, column in plan:
+            matrix[:, i] = features[column].to_numpy(dtype=dtype, na_value=0.0)
+
+        # Sanitize in one in-place vectorized pass; infinities from
+        # upstream ratio features would otherwise poison model outputs
+        np.nan_to_num(matrix, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+
+        return pd.DataFrame(
+            matrix,
+            columns=list(required_columns),
+            index=features.index,
+            copy=False
+        )
     
     async def _calculate_model_confidence(
         self,
@@ -382,7 +667,9 @@ class PredictionEngine:
             
             # Calculate based on prediction variance
             if len(prediction) > 1:
-                return max(0.0, 1.0 - np.std(prediction) / (np.mean(np.abs(prediction)) + 1e-8))
+                return float(_confidence_kernel(
+                    np.ascontiguousarray(prediction, dtype=np.float64)
+                ))
             
             # Default confidence for single prediction
             return 0.5
@@ -400,7 +687,12 @@ class PredictionEngine:
         try:
             if not model_predictions:
                 raise ValueError("No model predictions available for ensemble")
-            
+
+            # Single-model fast path: nothing to combine, skip the
+            # weighting and reduction pass entirely
+            if len(model_predictions) == 1:
+                return np.asarray(model_predictions[0].prediction)
+
             # Use ensemble predictor
             ensemble_prediction = await self.ensemble_predictor.predict(
                 model_predictions,
@@ -420,20 +712,22 @@ class PredictionEngine:
         """Calculate overall confidence score"""
         if not model_predictions:
             return 0.0
-        
-        # Weight by individual model confidence
-        total_weight = sum(pred.confidence for pred in model_predictions)
+
+        # Weight by individual model confidence, in one vectorized pass
+        confidences = np.fromiter(
+            (pred.confidence for pred in model_predictions),
+            dtype=np.float64,
+            count=len(model_predictions)
+        )
+        total_weight = confidences.sum()
         if total_weight == 0:
             return 0.0
-        
-        weighted_confidence = sum(
-            pred.confidence * pred.confidence 
-            for pred in model_predictions
-        ) / total_weight
-        
+
+        weighted_confidence = float(np.dot(confidences, confidences) / total_weight)
+
         # Adjust for number of models (more models = higher confidence)
         model_count_factor = min(1.0, len(model_predictions) / 3.0)
-        
+
         return min(1.0, weighted_confidence * model_count_factor)
     
     async def get_prediction_history(
@@ -443,37 +737,74 @@ class PredictionEngine:
     ) -> List[Dict[str, Any]]:
         """Get prediction history for a symbol"""
         try:
-            # Get from Redis cache
-            cache_key = f"predictions:history:{symbol}"
-            history = await redis_client.lrange(cache_key, 0, limit - 1)
-            
-            # Parse and return
-            return [eval(pred) for pred in history]
+            # Newest-first from the capped per-symbol stream
+            stream_key = f"predictions:stream:{symbol}"
+            entries = await redis_client.xrevrange(stream_key, count=limit)
+
+            return [
+                msgpack.unpackb(entry[1][b"d"], raw=False)
+                for entry in entries
+            ]
             
         except Exception as e:
             logger.error("Failed to get prediction history", symbol=symbol, error=str(e))
             return []
     
+    async def get_performance_stats(
+        self,
+        symbol: str,
+        days: int = 30
+    ) -> Dict[str, Any]:
+        """Aggregate prediction performance metrics for a symbol"""
+        try:
+            history = await self.get_prediction_history(symbol, days * 4)  # 4 predictions per day
+
+            # Single pass over the history instead of one scan per metric
+            total = len(history)
+            successful = 0
+            confidence_sum = 0.0
+            for pred in history:
+                metadata = pred.get("metadata", {})
+                if metadata.get("error") is None:
+                    successful += 1
+                confidence_sum += metadata.get("confidence_score", 0)
+
+            return {
+                "total_predictions": total,
+                "successful_predictions": successful,
+                "success_rate": successful / total if total > 0 else 0,
+                "average_confidence": confidence_sum / total if total > 0 else 0
+            }
+
+        except Exception as e:
+            logger.error("Failed to get performance stats", symbol=symbol, error=str(e))
+            return {
+                "total_predictions": 0,
+                "successful_predictions": 0,
+                "success_rate": 0,
+                "average_confidence": 0
+            }
+
     async def store_prediction(
         self,
         prediction: PredictionResponse
     ) -> None:
         """Store prediction in cache for history"""
         try:
-            cache_key = f"predictions:history:{prediction.symbol}"
-            
-            # Store prediction
-            await redis_client.lpush(
-                cache_key,
-                str(prediction.dict())
+            stream_key = f"predictions:stream:{prediction.symbol}"
+            # model_dump(mode="json") walks the model in pydantic-core and
+            # emits msgpack-ready primitives (datetimes as ISO strings)
+            payload = msgpack.packb(prediction.model_dump(mode="json"), use_bin_type=True)
+
+            # XADD with approximate maxlen trims in O(1); the cap
+            # replaces the old ltrim + expire bookkeeping
+            await redis_client.xadd(
+                stream_key,
+                {"d": payload},
+                maxlen=1000,
+                approximate=True
             )
             
-            # Keep only recent predictions
-            await redis_client.ltrim(cache_key, 0, 999)
-            
-            # Set expiration
-            await redis_client.expire(cache_key, 86400 * 7)  # 7 days
-            
         except Exception as e:
             logger.error("Failed to store prediction", error=str(e))
     
@@ -13,7 +13,7 @@ import uvicorn
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 import structlog
 
 from app.core.config import settings
@@ -33,6 +33,7 @@ from app.services.model_manager import ModelManager
 from app.services.data_processor import DataProcessor
 from app.services.prediction_engine import PredictionEngine
 from app.middleware.auth import AuthMiddleware
+from app.middleware.compression import ZstdMiddleware
 from app.middleware.rate_limit import RateLimitMiddleware
 from app.middleware.monitoring import MonitoringMiddleware
 
@@ -103,6 +104,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -116,6 +118,7 @@ app.add_middleware(
 )
 
 app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(ZstdMiddleware, minimum_size=1000)
 app.add_middleware(AuthMiddleware)
 app.add_middleware(RateLimitMiddleware)
 app.add_middleware(MonitoringMiddleware)
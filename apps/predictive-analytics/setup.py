@@ -0,0 +1,24 @@
+"""
+Build script for the optional compiled metric kernels
+
+Usage: python setup.py build_ext --inplace
+The service runs fine without the extensions; app.utils.metrics falls
+back to its NumPy implementation.
+"""
+
+from setuptools import Extension, setup
+
+try:
+    from Cython.Build import cythonize
+    ext_modules = cythonize(
+        [Extension("app.utils.metrics_kernel", ["app/utils/metrics_kernel.pyx"])],
+        language_level=3,
+    )
+except ImportError:
+    ext_modules = []
+
+setup(
+    name="predictive-analytics-kernels",
+    version="1.0.0",
+    ext_modules=ext_modules,
+)